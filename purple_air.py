@@ -7,12 +7,18 @@ Created on Tue Sep  2 15:10:30 2025
 
 import os
 import math
-import time
+import bisect
+import random
+import threading
+from collections import OrderedDict
 from datetime import datetime, timezone
-from typing import Dict, Any, Optional, Tuple
+from typing import Dict, Any, NamedTuple, Optional, Tuple
 
+import orjson
 import requests
 import streamlit as st
+from streamlit_autorefresh import st_autorefresh
+from urllib3.util.retry import Retry
 
 # ------------------------------
 # App Config
@@ -45,6 +51,10 @@ st.markdown(
 # Helpers
 # ------------------------------
 
+_isfinite = math.isfinite  # bound once; used by every assess_* guard
+
+
+@st.cache_resource
 def get_api_key() -> str:
     key = None
     if "PURPLEAIR_API_KEY" in st.secrets:
@@ -52,38 +62,95 @@ def get_api_key() -> str:
     if not key:
         key = os.getenv("PURPLEAIR_API_KEY")
     if not key:
+        msg = "Missing PurpleAir API key. Set st.secrets['PURPLEAIR_API_KEY'] or the PURPLEAIR_API_KEY env var."
+        st.error(msg)
         st.stop()
-        raise RuntimeError("Missing PurpleAir API key. Set st.secrets['PURPLEAIR_API_KEY'] or the PURPLEAIR_API_KEY env var.")
+        raise RuntimeError(msg)
     return key
 
 
+class JitteredRetry(Retry):
+    """Retry with full-jitter backoff so concurrent sessions don't retry in lockstep."""
+
+    BACKOFF_CAP = 8.0  # seconds
+    RETRY_AFTER_CAP = 30.0  # seconds
+
+    def get_backoff_time(self) -> float:
+        # urllib3 computes min(backoff_max, factor * 2**n); draw uniformly below it.
+        # A Retry-After header still takes precedence over this value.
+        ceiling = min(self.BACKOFF_CAP, super().get_backoff_time())
+        return random.uniform(0, ceiling) if ceiling > 0 else 0.0
+
+    def get_retry_after(self, response) -> Optional[float]:
+        # Retry-After (seconds or HTTP-date) is parsed by urllib3; never wait less
+        # than our own backoff, and cap pathological values.
+        retry_after = super().get_retry_after(response)
+        if retry_after is None:
+            return None
+        return max(min(retry_after, self.RETRY_AFTER_CAP), self.get_backoff_time())
+
+
 @st.cache_resource
 def http_session() -> requests.Session:
     s = requests.Session()
-    adapter = requests.adapters.HTTPAdapter(pool_connections=8, pool_maxsize=8)
+    # Retry 429/5xx inside urllib3 on the pooled connection (honors Retry-After)
+    retry = JitteredRetry(
+        total=3,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        respect_retry_after_header=True,
+        allowed_methods=frozenset(["GET"]),
+    )
+    # Single host (api.purpleair.com); size the pool for concurrent sessions, not hosts
+    adapter = requests.adapters.HTTPAdapter(max_retries=retry, pool_connections=1, pool_maxsize=32, pool_block=False)
     s.mount("https://", adapter)
+    s.headers["Connection"] = "keep-alive"
+    s.headers["X-API-Key"] = get_api_key()
     return s
 
 
+def _head_quietly(session: requests.Session) -> None:
+    try:
+        # Any status (404/401 included) is fine; we only want a handshaked socket in the
+        # pool. Sent without the API key so it isn't an authenticated API call.
+        session.head("https://api.purpleair.com/v1/sensors/0", headers={"X-API-Key": None}, timeout=5)
+    except requests.RequestException:
+        pass
+
+
+@st.cache_resource
+def warm_connection_pool() -> threading.Thread:
+    """Resolve DNS + open the TLS connection once per process, off the render thread."""
+    t = threading.Thread(target=_head_quietly, args=(http_session(),), daemon=True)
+    t.start()
+    return t
+
+
+# EPA PM2.5 breakpoints mirrored to AQI bands: (c_lo, c_hi, i_lo, i_hi)
+_AQI_BPS = (
+    (0.0, 12.0, 0, 50),
+    (12.1, 35.4, 51, 100),
+    (35.5, 55.4, 101, 150),
+    (55.5, 150.4, 151, 200),
+    (150.5, 250.4, 201, 300),
+    (250.5, 350.4, 301, 400),
+    (350.5, 500.4, 401, 500),
+)
+_PM25_CUTS = tuple(bp[1] for bp in _AQI_BPS)  # inclusive upper bounds (µg/m³)
+
+
+def _pm25_band(pm: float) -> int:
+    """Row of _AQI_BPS for a PM2.5 value; bisect_left keeps upper bounds inclusive."""
+    return min(bisect.bisect_left(_PM25_CUTS, pm), len(_PM25_CUTS) - 1)
+
+
 def epa_aqi_pm25(pm25: Optional[float]) -> Optional[int]:
-    if pm25 is None or math.isnan(pm25):
+    if pm25 is None or not _isfinite(pm25):
         return None
-    # EPA PM2.5 breakpoints mirrored to AQI bands
-    bps = [
-        (0.0, 12.0, 0, 50),
-        (12.1, 35.4, 51, 100),
-        (35.5, 55.4, 101, 150),
-        (55.5, 150.4, 151, 200),
-        (150.5, 250.4, 201, 300),
-        (250.5, 350.4, 301, 400),
-        (350.5, 500.4, 401, 500),
-    ]
     x = min(max(pm25, 0.0), 500.4)
-    for c_lo, c_hi, i_lo, i_hi in bps:
-        if c_lo <= x <= c_hi:
-            aqi = (i_hi - i_lo) / (c_hi - c_lo) * (x - c_lo) + i_lo
-            return int(round(aqi))
-    return None
+    c_lo, c_hi, i_lo, i_hi = _AQI_BPS[_pm25_band(x)]
+    aqi = (i_hi - i_lo) / (c_hi - c_lo) * (x - c_lo) + i_lo
+    return int(round(aqi))
 
 
 def fmt_ts(ts: Optional[int]) -> str:
@@ -113,67 +180,72 @@ def safe_float(val: Any) -> Optional[float]:
         return None
 
 
+# AQI upper bounds of the first five bands, taken from the same breakpoint table
+_AQI_CUTS = tuple(bp[3] for bp in _AQI_BPS[:5])
+_AQI_LABELS = (
+    ("Good", "🟢", "Air quality is satisfactory. Outdoor activities are safe.", "good"),
+    ("Moderate", "🟡", "Acceptable; unusually sensitive people should reduce prolonged exertion.", "moderate"),
+    ("Unhealthy for Sensitive Groups", "🟠", "Sensitive groups should reduce prolonged or heavy exertion.", "usg"),
+    ("Unhealthy", "🔴", "Everyone may experience health effects; limit prolonged outdoor exertion.", "unhealthy"),
+    ("Very Unhealthy", "🟣", "Health alert: avoid prolonged or heavy exertion outdoors.", "veryunhealthy"),
+    ("Hazardous", "🟤", "Health warnings of emergency conditions: avoid all outdoor exertion.", "hazardous"),
+)
+
+
 def assess_aqi(aqi: Optional[int]) -> Tuple[str, str, str, str]:
     """Return (label, emoji, guidance, css_class) based on EPA AQI categories."""
     if aqi is None:
         return ("Unknown", "⚪", "No AQI available.", "")
-    if 0 <= aqi <= 50:
-        return ("Good", "🟢", "Air quality is satisfactory. Outdoor activities are safe.", "good")
-    if 51 <= aqi <= 100:
-        return ("Moderate", "🟡", "Acceptable; unusually sensitive people should reduce prolonged exertion.", "moderate")
-    if 101 <= aqi <= 150:
-        return ("Unhealthy for Sensitive Groups", "🟠", "Sensitive groups should reduce prolonged or heavy exertion.", "usg")
-    if 151 <= aqi <= 200:
-        return ("Unhealthy", "🔴", "Everyone may experience health effects; limit prolonged outdoor exertion.", "unhealthy")
-    if 201 <= aqi <= 300:
-        return ("Very Unhealthy", "🟣", "Health alert: avoid prolonged or heavy exertion outdoors.", "veryunhealthy")
-    return ("Hazardous", "🟤", "Health warnings of emergency conditions: avoid all outdoor exertion.", "hazardous")
+    return _AQI_LABELS[bisect.bisect_left(_AQI_CUTS, aqi)]
+
+
+# One entry per _AQI_BPS row (the two top AQI bands are both "Hazardous")
+_PM25_BANDS = (
+    ("Good", "Within EPA 24h guideline (0–12 µg/m³).", "good"),
+    ("Moderate", "Consider caution for unusually sensitive people.", "moderate"),
+    ("USG", "Sensitive groups should reduce prolonged outdoor exertion.", "usg"),
+    ("Unhealthy", "Everyone may experience health effects—limit outdoor exertion.", "unhealthy"),
+    ("Very Unhealthy", "Avoid outdoor activities; use masks/air purifiers if possible.", "veryunhealthy"),
+    ("Hazardous", "Serious risk—stay indoors with clean air if available.", "hazardous"),
+    ("Hazardous", "Serious risk—stay indoors with clean air if available.", "hazardous"),
+)
 
 
 def assess_pm25(pm: Optional[float]) -> Tuple[str, str, str]:
     """Return (label, note, css_class) mirroring AQI breakpoints for PM2.5 concentration."""
-    if pm is None or math.isnan(pm):
+    if pm is None or not _isfinite(pm):
         return ("—", "No PM2.5 data.", "")
-    x = pm
-    if 0 <= x <= 12.0:
-        return ("Good", "Within EPA 24h guideline (0–12 µg/m³).", "good")
-    if 12.1 <= x <= 35.4:
-        return ("Moderate", "Consider caution for unusually sensitive people.", "moderate")
-    if 35.5 <= x <= 55.4:
-        return ("USG", "Sensitive groups should reduce prolonged outdoor exertion.", "usg")
-    if 55.5 <= x <= 150.4:
-        return ("Unhealthy", "Everyone may experience health effects—limit outdoor exertion.", "unhealthy")
-    if 150.5 <= x <= 250.4:
-        return ("Very Unhealthy", "Avoid outdoor activities; use masks/air purifiers if possible.", "veryunhealthy")
-    return ("Hazardous", "Serious risk—stay indoors with clean air if available.", "hazardous")
+    return _PM25_BANDS[_pm25_band(pm)]
+
+
+# PurpleAir reports temperature in °F. Bands: cool | — | comfort | — | high heat, i.e.
+# < lo[0], [lo[0], lo[1]), [lo[1], hi[0]], (hi[0], hi[1]], > hi[1]. Lower cuts open
+# their band (bisect_right), upper cuts close theirs inclusively (bisect_left).
+_TEMP_F_CUTS = ((50, 68), (77, 86))
+_TEMP_C_CUTS = ((10, 20), (25, 30))
+_TEMP_MSGS = (
+    "Cool: consider layering for warmth.",
+    "—",
+    "Comfort range for many indoors conditions.",
+    "—",
+    "High heat: watch for heat stress; hydrate and rest.",
+)
 
 
 def assess_temp(value: Optional[float], to_unit: str) -> Tuple[str, str]:
     """Return (display_value, guidance) based on comfort ranges."""
-    if value is None or math.isnan(value):
+    if value is None or not _isfinite(value):
         return ("—", "No temperature data.")
     if to_unit == "Fahrenheit":
-        v = value if 40 <= value <= 120 else (value * 9/5 + 32)
-        if 68 <= v <= 77:
-            return (f"{v:.1f} °F", "Comfort range for many indoors conditions.")
-        if v > 86:
-            return (f"{v:.1f} °F", "High heat: watch for heat stress; hydrate and rest.")
-        if v < 50:
-            return (f"{v:.1f} °F", "Cool: consider layering for warmth.")
-        return (f"{v:.1f} °F", "—")
+        v, cuts, unit = value, _TEMP_F_CUTS, "°F"
     else:
-        v = value if -20 <= value <= 50 else ((value - 32) * 5/9)
-        if 20 <= v <= 25:
-            return (f"{v:.1f} °C", "Comfort range for many indoors conditions.")
-        if v > 30:
-            return (f"{v:.1f} °C", "High heat: watch for heat stress; hydrate and rest.")
-        if v < 10:
-            return (f"{v:.1f} °C", "Cool: consider layering for warmth.")
-        return (f"{v:.1f} °C", "—")
+        v, cuts, unit = (value - 32) * 5 / 9, _TEMP_C_CUTS, "°C"
+    lo, hi = cuts
+    return (f"{v:.1f} {unit}", _TEMP_MSGS[bisect.bisect_right(lo, v) + bisect.bisect_left(hi, v)])
 
 
 def assess_humidity(h: Optional[float]) -> Tuple[str, str]:
-    if h is None or math.isnan(h):
+    if h is None or not _isfinite(h):
         return ("—", "No humidity data.")
     if 40 <= h <= 60:
         return (f"{h:.0f}%", "Comfort range (40–60%).")
@@ -189,7 +261,7 @@ def assess_humidity(h: Optional[float]) -> Tuple[str, str]:
 
 
 def assess_pressure(p: Optional[float]) -> Tuple[str, str]:
-    if p is None or math.isnan(p):
+    if p is None or not _isfinite(p):
         return ("—", "No pressure data.")
     if p < 1000:
         return (f"{p:.1f} hPa", "Low pressure: unsettled weather likely.")
@@ -198,47 +270,121 @@ def assess_pressure(p: Optional[float]) -> Tuple[str, str]:
     return (f"{p:.1f} hPa", "Near average (~1013 hPa).")
 
 
+ETagEntry = Tuple[Optional[str], Optional[str], Dict[str, Any]]
+
+
+class ETagStore:
+    """Bounded LRU of (sensor_index, fields) -> (ETag, Last-Modified, payload); thread-safe."""
+
+    def __init__(self, max_entries: int = 128):
+        self._entries: "OrderedDict[Tuple[int, Optional[str]], ETagEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._max_entries = max_entries
+
+    def get(self, key: Tuple[int, Optional[str]]) -> Optional[ETagEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: Tuple[int, Optional[str]], entry: ETagEntry) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+
+@st.cache_resource
+def etag_store() -> ETagStore:
+    """Process-wide validators + last payload, capped like fetch_sensor's own cache."""
+    return ETagStore(max_entries=128)
+
+
+# Only the fields the dashboard reads (keeps responses + cache entries small)
+_FIELDS = (
+    "name,last_seen,model,firmware_version,rssi,"
+    "pm2.5_atm,pm2.5,pm2.5_a,pm2.5_10minute,pm2.5_30minute,pm2.5_60minute,"
+    "humidity,temperature,pressure"
+)
+
+
 @st.cache_data(ttl=TTL_SECONDS, max_entries=128)
 def fetch_sensor(sensor_index: int, *, fields: Optional[str] = None) -> Dict[str, Any]:
-    """PurpleAir v1 single-sensor call with tiny retry on 429/5xx."""
-    api_key = get_api_key()
+    """PurpleAir v1 single-sensor call; 429/5xx retries are handled by the session adapter."""
     base = f"https://api.purpleair.com/v1/sensors/{sensor_index}"
-    headers = {"X-API-Key": api_key}
     params = {}
     if fields:
         params["fields"] = fields
 
-    backoffs = [0, 0.6, 1.2]  # seconds
-    last_exc = None
-    for pause in backoffs:
-        try:
-            if pause:
-                time.sleep(pause)
-            resp = http_session().get(base, headers=headers, params=params, timeout=15)
-            if resp.status_code == 200:
-                return resp.json()
-            # retry only for 429/5xx
-            if resp.status_code not in (429, 500, 502, 503, 504):
-                resp.raise_for_status()
-        except Exception as e:
-            last_exc = e
-            continue
-    # if we got here, give best error
-    if last_exc:
-        raise last_exc
-    raise RuntimeError("PurpleAir API request failed.")
-
-
-def get_field(d: Dict[str, Any], *keys: str) -> Optional[Any]:
-    cur = d
-    try:
-        for k in keys:
-            if cur is None:
-                return None
-            cur = cur.get(k)
-        return cur
-    except Exception:
-        return None
+    # Conditional GET: a 304 reuses the last payload instead of re-downloading it
+    store = etag_store()
+    key = (sensor_index, fields)
+    cached = store.get(key)
+    headers = {}
+    if cached:
+        etag, last_modified, _ = cached
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+    resp = http_session().get(base, params=params, headers=headers, timeout=15)
+    if resp.status_code == 304:
+        if not cached:
+            raise RuntimeError("PurpleAir API returned 304 Not Modified without a stored payload.")
+        return cached[2]
+    resp.raise_for_status()
+    payload = orjson.loads(resp.content)
+    etag, last_modified = resp.headers.get("ETag"), resp.headers.get("Last-Modified")
+    if etag or last_modified:
+        store.put(key, (etag, last_modified, payload))
+    return payload
+
+
+class SensorView(NamedTuple):
+    """Display-ready fields extracted from a PurpleAir sensor payload."""
+    name: str
+    last_seen: Optional[int]
+    model: Optional[str]
+    firmware: Optional[str]
+    rssi: Optional[int]
+    pm25: Optional[float]
+    pm25_10m: Optional[float]
+    pm25_30m: Optional[float]
+    pm25_60m: Optional[float]
+    humidity: Optional[float]
+    temperature: Optional[float]
+    pressure: Optional[float]
+    aqi: Optional[int]
+    raw: Dict[str, Any]  # the payload's "sensor" object, for the debug view
+
+
+# cache_resource, not cache_data: the script module (and so SensorView) is recreated
+# every run, which makes pickling it fail across concurrent sessions. Treat as read-only.
+@st.cache_resource(ttl=TTL_SECONDS, max_entries=128)
+def extract_sensor(sensor_index: int) -> SensorView:
+    """Fetch + parse once per TTL; shared across sessions and widget-only reruns."""
+    payload = fetch_sensor(sensor_index, fields=_FIELDS)
+    sensor = (payload.get("sensor") if isinstance(payload, dict) else None) or {}
+    pm25 = safe_float(sensor.get("pm2.5_atm") or sensor.get("pm2.5") or sensor.get("pm2.5_a"))
+    return SensorView(
+        name=sensor.get("name") or f"Sensor {sensor_index}",
+        last_seen=sensor.get("last_seen"),
+        model=sensor.get("model"),
+        firmware=sensor.get("firmware_version"),
+        rssi=sensor.get("rssi"),
+        pm25=pm25,
+        pm25_10m=safe_float(sensor.get("pm2.5_10minute")),
+        pm25_30m=safe_float(sensor.get("pm2.5_30minute")),
+        pm25_60m=safe_float(sensor.get("pm2.5_60minute")),
+        humidity=safe_float(sensor.get("humidity")),
+        temperature=safe_float(sensor.get("temperature")),
+        pressure=safe_float(sensor.get("pressure")),
+        aqi=epa_aqi_pm25(pm25),
+        raw=sensor,
+    )
 
 
 # ------------------------------
@@ -268,15 +414,21 @@ with st.sidebar:
     if st.button("Refresh now"):
         st.rerun()
 
-# Persist to URL (non-blocking)
+# Warm the API connection in the background (best effort)
 try:
-    st.query_params.update({
-        "sensor": str(sensor_id or ""),
-        "unit": "F" if unit_choice == "Fahrenheit" else "C",
-    })
+    warm_connection_pool()
 except Exception:
     pass
 
+# Persist to URL (non-blocking; only when the inputs changed)
+qp_state = (str(sensor_id or ""), "F" if unit_choice == "Fahrenheit" else "C")
+if st.session_state.get("_qp") != qp_state:
+    try:
+        st.query_params.update({"sensor": qp_state[0], "unit": qp_state[1]})
+        st.session_state["_qp"] = qp_state
+    except Exception:
+        pass
+
 # Validate & fetch
 try:
     sensor_index = int(sensor_id)
@@ -285,94 +437,60 @@ except ValueError:
     st.stop()
 
 try:
-    payload = fetch_sensor(sensor_index)
+    view = extract_sensor(sensor_index)
 except Exception as e:
     st.error(f"Failed to fetch sensor: {e}")
     st.stop()
 
-sensor = get_field(payload, "sensor") or {}
-
-# Fields (with safe casting)
-name = sensor.get("name") or f"Sensor {sensor_index}"
-last_seen = sensor.get("last_seen")
-model = sensor.get("model")
-firmware = sensor.get("firmware_version")
-rssi = sensor.get("rssi")
-
-pm25 = safe_float(sensor.get("pm2.5_atm") or sensor.get("pm2.5") or sensor.get("pm2.5_a"))
-pm25_10m = safe_float(sensor.get("pm2.5_10minute"))
-pm25_30m = safe_float(sensor.get("pm2.5_30minute"))
-pm25_60m = safe_float(sensor.get("pm2.5_60minute"))
-
-humidity = safe_float(sensor.get("humidity"))
-raw_temp = safe_float(sensor.get("temperature"))
-pressure = safe_float(sensor.get("pressure"))
-
-aqi = epa_aqi_pm25(pm25)
-
 # Header
 left, right = st.columns([0.65, 0.35])
 with left:
-    st.subheader(name)
-    st.caption(f"Last seen: {fmt_ts(last_seen)} | Model: {model or '—'} | FW: {firmware or '—'} | RSSI: {rssi if rssi is not None else '—'} dBm")
+    st.subheader(view.name)
+    st.caption(f"Last seen: {fmt_ts(view.last_seen)} | Model: {view.model or '—'} | FW: {view.firmware or '—'} | RSSI: {view.rssi if view.rssi is not None else '—'} dBm")
 with right:
     st.write("")
     st.write("")
     st.toggle(f"Auto refresh ({TTL_SECONDS//60} min)", value=auto_refresh, key="auto_refresh_toggle", help=f"When on, the data is cached for {TTL_SECONDS}s and the page auto-reruns.")
 
-# Key metrics
-col1, col2, col3, col4, col5 = st.columns(5)
-
-# AQI
-with col1:
-    st.metric("US AQI (PM2.5)", value=(str(aqi) if aqi is not None else "—"))
-    label, emoji, guide, css_class = assess_aqi(aqi)
-    st.caption(f"{emoji} {label} – {guide}")
-    if show_badges and css_class:
-        st.markdown(f"<span class='pill {css_class}'>AQI: {label}</span>", unsafe_allow_html=True)
+# Key metrics: (title, value, delta, caption, badge) per column
+label, emoji, guide, css_class = assess_aqi(view.aqi)
+p_label, p_note, p_class = assess_pm25(view.pm25)
+t_disp, t_note = assess_temp(view.temperature, unit_choice)
+h_disp, h_note = assess_humidity(view.humidity)
+pr_disp, pr_note = assess_pressure(view.pressure)
 
 # PM2.5 with trend delta vs 10m avg (if available)
-with col2:
-    pm_text = f"{pm25:.1f}" if isinstance(pm25, float) else "—"
-    delta_text = None
-    if isinstance(pm25, float) and isinstance(pm25_10m, float):
-        d = pm25 - pm25_10m
-        if abs(d) >= 0.1:
-            delta_text = f"{d:+.1f} vs 10m"
-    st.metric("PM2.5 (µg/m³)", value=pm_text, delta=delta_text)
-    p_label, p_note, p_class = assess_pm25(pm25)
-    st.caption(f"{p_label} – {p_note}")
-    if show_badges and p_class:
-        st.markdown(f"<span class='pill {p_class}'>PM2.5: {p_label}</span>", unsafe_allow_html=True)
-
-# Temperature
-with col3:
-    t_disp, t_note = assess_temp(raw_temp, unit_choice)
-    st.metric("Temperature", value=t_disp)
-    st.caption(t_note)
-
-# Humidity
-with col4:
-    h_disp, h_note = assess_humidity(humidity)
-    st.metric("Humidity", value=h_disp)
-    st.caption(h_note)
-
-# Pressure
-with col5:
-    p_disp, p_note = assess_pressure(pressure)
-    st.metric("Pressure", value=p_disp)
-    st.caption(p_note)
+pm_text = f"{view.pm25:.1f}" if isinstance(view.pm25, float) else "—"
+delta_text = None
+if isinstance(view.pm25, float) and isinstance(view.pm25_10m, float):
+    d = view.pm25 - view.pm25_10m
+    if abs(d) >= 0.1:
+        delta_text = f"{d:+.1f} vs 10m"
+
+metrics = (
+    ("US AQI (PM2.5)", str(view.aqi) if view.aqi is not None else "—", None,
+     f"{emoji} {label} – {guide}", (css_class, f"AQI: {label}")),
+    ("PM2.5 (µg/m³)", pm_text, delta_text, f"{p_label} – {p_note}", (p_class, f"PM2.5: {p_label}")),
+    ("Temperature", t_disp, None, t_note, None),
+    ("Humidity", h_disp, None, h_note, None),
+    ("Pressure", pr_disp, None, pr_note, None),
+)
+for col, (title, value, delta, caption, badge) in zip(st.columns(5), metrics):
+    col.metric(title, value=value, delta=delta)
+    col.caption(caption)
+    if show_badges and badge and badge[0]:
+        col.markdown(f"<span class='pill {badge[0]}'>{badge[1]}</span>", unsafe_allow_html=True)
 
 # Rolling averages (optional, zero extra calls)
-if any(isinstance(x, float) for x in (pm25_10m, pm25_30m, pm25_60m)):
+if any(isinstance(x, float) for x in (view.pm25_10m, view.pm25_30m, view.pm25_60m)):
     st.markdown("### PM2.5 Rolling Averages (if provided by device)")
     c1, c2, c3 = st.columns(3)
     with c1:
-        st.metric("10 min avg (µg/m³)", value=(f"{pm25_10m:.1f}" if isinstance(pm25_10m, float) else "—"))
+        st.metric("10 min avg (µg/m³)", value=(f"{view.pm25_10m:.1f}" if isinstance(view.pm25_10m, float) else "—"))
     with c2:
-        st.metric("30 min avg (µg/m³)", value=(f"{pm25_30m:.1f}" if isinstance(pm25_30m, float) else "—"))
+        st.metric("30 min avg (µg/m³)", value=(f"{view.pm25_30m:.1f}" if isinstance(view.pm25_30m, float) else "—"))
     with c3:
-        st.metric("60 min avg (µg/m³)", value=(f"{pm25_60m:.1f}" if isinstance(pm25_60m, float) else "—"))
+        st.metric("60 min avg (µg/m³)", value=(f"{view.pm25_60m:.1f}" if isinstance(view.pm25_60m, float) else "—"))
 
 # Reference – EPA descriptions
 with st.expander("Reference: EPA AQI Categories for PM2.5"):
@@ -390,17 +508,13 @@ with st.expander("Reference: EPA AQI Categories for PM2.5"):
 
 # Raw payload (optional)
 if show_raw:
-    with st.expander("Raw sensor payload (debug)"):
-        st.json(sensor)
+    with st.expander("Raw sensor payload (debug)", expanded=False):
+        # Only ship the JSON once explicitly requested (a collapsed expander still renders it)
+        if st.toggle("Load payload", key="raw_expanded"):
+            st.json(view.raw)
 
-# Light auto-refresh (sync with TTL)
+# Light auto-refresh (sync with TTL): a script rerun, not a full page reload,
+# so cached resources/data are reused
 if st.session_state.get("auto_refresh_toggle"):
     st.caption(f"Auto-refresh is ON. Data cache TTL = {TTL_SECONDS}s.")
-    st.markdown(
-        f"""
-        <script>
-        setTimeout(function(){{window.parent.location.reload()}}, {(TTL_SECONDS + 5) * 1000});
-        </script>
-        """,
-        unsafe_allow_html=True,
-    )
+    st_autorefresh(interval=(TTL_SECONDS + 5) * 1000, key="pa_refresh")